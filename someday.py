@@ -22,6 +22,7 @@ __version__ = "1.0.2"
 import os
 import re
 import sys
+import json
 import shlex
 import curses
 import gettext
@@ -29,9 +30,11 @@ import termios
 import textwrap
 import argparse
 import readline
+import functools
 import subprocess
 from time import sleep
-from shutil import copyfile
+from datetime import date, timedelta
+from itertools import islice
 from collections import namedtuple
 
 DOMAIN = "someday"
@@ -78,6 +81,220 @@ def get_search_pattern(args):
         return None
 
 
+# Where when keeps its preferences, and how the calendar is named there;
+# the regex is compiled once at module load
+
+_PREFS_PATH = os.path.join(os.path.expanduser("~"), ".when", "preferences")
+_PREFS_RE = re.compile(r"^\s*calendar\s*=\s*(.+)$", re.MULTILINE)
+
+# The pieces of calendar lines and of when's output that the Calendar
+# class keeps taking apart, compiled once instead of per call
+
+_SEARCH_PREFIX_RE = re.compile(r"^\s*(?:\S+\s+){4}")
+_JULIAN_OUT_RE = re.compile(r"(\d{5})\.$")
+
+# Set SOMEDAY_USE_WHEN in the environment to force every view refresh
+# through when, bypassing the in-process filter below (useful to check
+# that both paths agree on a given calendar)
+_FORCE_WHEN = "SOMEDAY_USE_WHEN" in os.environ
+
+# Date ranges used by when when no --past/--future arguments are given
+_DEFAULT_PAST = -1
+_DEFAULT_FUTURE = 14
+
+_MONTH_NAMES = (
+    "jan", "feb", "mar", "apr", "may", "jun",
+    "jul", "aug", "sep", "oct", "nov", "dec",
+)
+_DAY_NAMES = ("Sun", "Mon", "Tue", "Wed", "Thu", "Fri", "Sat")
+
+
+def _parse_month(text):
+    if text.isdigit():
+        month = int(text)
+        return month if 1 <= month <= 12 else None
+    prefix = text[:3].lower()
+    return _MONTH_NAMES.index(prefix) + 1 if prefix in _MONTH_NAMES else None
+
+
+# Parse a simple literal date ('2021 aug 15', possibly with * wildcards)
+# into a (year, month, day) tuple where None stands for a wildcard, or
+# return None if the text is anything else (e.g. a when expression)
+def _parse_literal_date(text):
+    parts = text.split()
+    if len(parts) != 3:
+        return None
+    year, month, day = parts
+    if year == "*":
+        year = None
+    elif year.isdigit():
+        year = int(year)
+    else:
+        return None
+    if month == "*":
+        month = None
+    else:
+        month = _parse_month(month)
+        if month is None:
+            return None
+    if day == "*":
+        day = None
+    elif day.isdigit() and 1 <= int(day) <= 31:
+        day = int(day)
+    else:
+        return None
+    return (year, month, day)
+
+
+# The leading field when uses to relate a listed day to today
+def _relation(delta, day):
+    if delta == 0:
+        return "today"
+    elif delta == 1:
+        return "tomorrow"
+    elif delta == -1:
+        return "yesterday"
+    else:
+        return _DAY_NAMES[day.isoweekday() % 7]
+
+
+# Analysis of when's date expressions. These are pure functions of the
+# expression text, and the menu predicates re-examine the same
+# expressions on every rebuild, so the entry points are memoized;
+# because the caches are keyed on the text itself, they never need
+# invalidating when the calendar changes. The parse results are built
+# from tuples so the cached values stay immutable.
+
+
+# Multi-character operators come first so '<=', '>=' and '!=' are read
+# as one token; an atom is any run of characters that is neither an
+# operator nor whitespace
+_TOKEN_RE = re.compile(r"<=|>=|!=|[()|&!=<>%-]|[^()|&!=<>%\s-]+")
+
+# Binding strength of the binary operators, loosest first
+_PRECEDENCE = {
+    "|": 1,
+    "&": 2,
+    "=": 3,
+    "!=": 3,
+    "<": 4,
+    ">": 4,
+    "<=": 4,
+    ">=": 4,
+    "-": 5,
+    "%": 6,
+}
+
+# Unary ! binds tighter than & but looser than the comparisons, which is
+# how the previous operator-by-operator parser split its operand
+_NOT_PRECEDENCE = 3
+
+
+def _parse_tokens(tokens, pos, min_precedence):
+    # One step of precedence climbing; returns (tree, next position) or
+    # None on a malformed expression
+    if pos == len(tokens):
+        return None
+    token = tokens[pos]
+    if token == "(":
+        tmp = _parse_tokens(tokens, pos + 1, 1)
+        if tmp is None:
+            return None
+        node, pos = tmp
+        if pos == len(tokens) or tokens[pos] != ")":
+            return None
+        pos += 1
+    elif token == "!":
+        tmp = _parse_tokens(tokens, pos + 1, _NOT_PRECEDENCE)
+        if tmp is None:
+            return None
+        node, pos = tmp
+        node = ("!", node)
+    elif token == "-":
+        # A leading minus only marks a negative number
+        if pos + 1 == len(tokens) or tokens[pos + 1] in _PRECEDENCE:
+            return None
+        node = "-" + tokens[pos + 1]
+        pos += 2
+    elif token in _PRECEDENCE or token == ")":
+        return None
+    else:
+        node = token
+        pos += 1
+    while pos < len(tokens):
+        op = tokens[pos]
+        precedence = _PRECEDENCE.get(op)
+        if precedence is None or precedence < min_precedence:
+            break
+        tmp = _parse_tokens(tokens, pos + 1, precedence + 1)
+        if tmp is None:
+            return None
+        right, pos = tmp
+        node = (op, node, right)
+    return node, pos
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_expression(text):
+    # Invalid expressions such as 'xx = #$$%' will get parsed by this
+    # function, but we can assume that any string which is passed to it
+    # comes from a valid calendar containing only valid expressions.
+    # Unbalanced parentheses and stray operators make it return None.
+    tokens = _TOKEN_RE.findall(text)
+    if not tokens:
+        return None
+    tmp = _parse_tokens(tuple(tokens), 0, 1)
+    if tmp is None:
+        return None
+    node, pos = tmp
+    return node if pos == len(tokens) else None
+
+
+def _is_literal(text):
+    # Actually, bogus strings such as 'bla bla bla' will pass this test,
+    # but we can assume that any string which is passed to this function
+    # comes from a valid calendar containing only valid day and month
+    # names. The cheap shape checks run first so most non-literal
+    # expressions never reach the parser at all.
+    tmp = text.split()
+    if len(tmp) != 3 or "*" in tmp:
+        return False
+    return parse_expression(text) is None
+
+
+@functools.lru_cache(maxsize=4096)
+def _happens_only_once(date):
+    if _is_literal(date):
+        return True
+    tmp = parse_expression(date)
+    if tmp is None:
+        return False
+    if len(tmp) == 3:
+        if tmp[0] == "=":
+            if tmp[1] == "j" and tmp[2].isdigit():
+                return True
+            elif tmp[2] == "j" and tmp[1].isdigit():
+                return True
+            else:
+                return False
+    return False
+
+
+# The (date expression, event) parts of a calendar line; memoized on the
+# line text because the menu predicates re-split the selected line on
+# every rebuild. A plain split on the first comma replaces the two
+# regex passes the parts used to take.
+@functools.lru_cache(maxsize=4096)
+def _split_source_line(line):
+    date_part, comma, event = line.partition(",")
+    if not comma:
+        return (None, None)
+    return (
+        date_part.strip() if date_part else None,
+        event.strip() if event else None,
+    )
+
+
 # Some data types used by the program
 
 # Views restrict the calendar items shown by the program to a certain date
@@ -118,32 +335,71 @@ class Calendar:
         self._proxy_calendar = self._calendar + ".SOMEDAY"
         self._backup_calendar = self._calendar + ".SOMEDAY.BAK"
 
-        self._check_no_proxy_calendar_exists()
+        # Build the line list straight from the file iterator: reading
+        # the whole file first just to split it again would hold two
+        # copies of the calendar in memory for a moment
+        # The 128K buffer lets typical calendars arrive in one read.
+        # Blank and comment lines repeat a lot in real calendars (they
+        # are used as separators), so those are interned to share one
+        # object per distinct text.
+        self._calendar_lines = []
+        with open(self._calendar, buffering=1 << 17) as infile:
+            for line in infile:
+                line = line.rstrip("\r\n")
+                if not line or line.isspace() or line.lstrip()[0] == "#":
+                    line = sys.intern(line)
+                self._calendar_lines.append(line)
+
+        # Parallel flags telling which lines have content, kept in sync
+        # by the mutators below, so each view refresh does not re-strip
+        # every line just to test for blankness
+        self._nonblank = [
+            bool(line) and not line.isspace()
+            for line in self._calendar_lines
+        ]
+
+        # Claim the proxy calendar right away: it doubles as a lock
+        # against concurrent runs, and the in-process filter below may
+        # never write it otherwise
+        self._claim_proxy_calendar()
 
-        with open(self._calendar) as infile:
-            self._calendar_lines = infile.read().splitlines()
+        # Deleted lines are only marked here at first; see
+        # delete_source_line below
+        self._deleted = set()
 
         self._line_numbers = []
         self._modified = False
         self._created_backup = False
 
         self._view_mode = View(None, None, None)
+        self._when_argv = self._build_when_argv(self._view_mode)
 
         self._last_modified = os.path.getmtime(self._calendar)
 
     def _get_default_calendar(self):
         try:
-            with open("%s/.when/preferences" % os.environ["HOME"]) as f:
+            with open(_PREFS_PATH) as f:
                 prefs = f.read()
-            m = re.match(
-                r"^\s*calendar\s*=\s*(.+)$", prefs, flags=re.MULTILINE
-            )
+            # search, not match: the calendar setting need not be the
+            # first line of the preferences file
+            m = _PREFS_RE.search(prefs)
             return m.group(1).strip()
         except (FileNotFoundError, AttributeError):
             sys.exit(_("No calendar configuration for 'when' was found."))
 
-    def _check_no_proxy_calendar_exists(self):
-        if os.path.exists(self._proxy_calendar):
+    def _claim_proxy_calendar(self):
+        # O_EXCL makes the existence check and the creation a single
+        # atomic step, so two instances racing at startup cannot both
+        # get past it
+        try:
+            os.close(
+                os.open(
+                    self._proxy_calendar,
+                    os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                    0o600,
+                )
+            )
+        except FileExistsError:
             sys.exit(
                 _(
                     "The program seems to be already running. If you are sure "
@@ -157,52 +413,177 @@ class Calendar:
 
     def set_view_mode(self, mode):
         self._view_mode = mode
+        self._when_argv = self._build_when_argv(mode)
         self._update_view()
 
-    # Copy the when's calendary to a temporary file where each non-empty line
-    # is line-numbered, and get upcoming items from there
-
-    def _update_view(self):
-        with open(self._proxy_calendar, "w") as outfile:
-            for i, line in enumerate(self._calendar_lines):
-                tmp_line = "%s-%s" % (line, i) if line.strip() else line
-                print(tmp_line, file=outfile)
+    # The when command line depends only on the view mode, so it is
+    # rebuilt when the mode changes rather than on every refresh
 
+    def _build_when_argv(self, mode):
         d = [
             "when",
-            "--calendar=%s" % self._proxy_calendar,
+            "--calendar=/dev/stdin",
             "--noheader",
             "--wrap=0",
         ]
+        if mode.past is not None:
+            d.append("--past=%s" % mode.past)
+        if mode.future is not None:
+            d.append("--future=%s" % mode.future)
+        return d
+
+    # Get the upcoming items for the current view mode. When every entry
+    # in the calendar uses a literal date, the filtering is done entirely
+    # in-process; otherwise we fall back to asking when (see below).
+
+    def _update_view(self):
+        view = self._filter_upcoming()
+        if view is not None:
+            self._shown_items, self._line_numbers = view
+        else:
+            self._update_view_from_when()
 
-        if self._view_mode.past is not None:
-            d.append("--past=%s" % self._view_mode.past)
-        if self._view_mode.future is not None:
-            d.append("--future=%s" % self._view_mode.future)
+    # Filter upcoming items without spawning when. Returns None when some
+    # line needs when's expression language (or SOMEDAY_USE_WHEN is set),
+    # in which case the caller must go through when itself.
+
+    def _filter_upcoming(self):
+        if _FORCE_WHEN:
+            return None
+        entries = []
+        for i, line in enumerate(self._calendar_lines):
+            if i in self._deleted:
+                continue
+            stripped = line.strip()
+            if not stripped or stripped.startswith("#"):
+                continue
+            if "," not in stripped:
+                return None
+            date_part, event = stripped.split(",", 1)
+            literal = _parse_literal_date(date_part.strip())
+            if literal is None:
+                return None
+            entries.append((literal, event.strip(), i))
+        past = self._view_mode.past
+        if past is None:
+            past = _DEFAULT_PAST
+        future = self._view_mode.future
+        if future is None:
+            future = _DEFAULT_FUTURE
+        pattern = self._view_mode.search_pattern
+        today = date.today()
+        # Keyed by (day, position in the calendar) so that, like when's
+        # output, the listing is sorted by date with same-day items in
+        # calendar order
+        found = []
+        for order, (literal, event, i) in enumerate(entries):
+            if pattern is not None and pattern.search(event) is None:
+                continue
+            year, month, day_of_month = literal
+            if None not in literal:
+                # A fully literal date matches one day at most: no need
+                # to walk the whole range (which can span years when
+                # searching)
+                try:
+                    day = date(year, month, day_of_month)
+                except ValueError:
+                    continue
+                if past <= (day - today).days <= future:
+                    found.append((day, order, event, i))
+            else:
+                for delta in range(past, future + 1):
+                    day = today + timedelta(days=delta)
+                    if year is not None and year != day.year:
+                        continue
+                    if month is not None and month != day.month:
+                        continue
+                    if day_of_month is not None and day_of_month != day.day:
+                        continue
+                    found.append((day, order, event, i))
+        found.sort(key=lambda x: (x[0], x[1]))
+        items = []
+        line_numbers = []
+        for day, order, event, i in found:
+            items.append(
+                "%s %s %s %s %s"
+                % (
+                    _relation((day - today).days, day),
+                    day.year,
+                    _MONTH_NAMES[day.month - 1].capitalize(),
+                    day.day,
+                    event,
+                )
+            )
+            line_numbers.append(i)
+        return items, line_numbers
+
+    # Hand when a copy of the calendar where each non-empty line is
+    # line-numbered, and get the upcoming items from its output. The copy
+    # goes over when's standard input: writing it to the proxy file on
+    # every refresh would be pure disk traffic (the proxy itself stays
+    # around, empty, as the lock claimed at startup).
+
+    def _update_view_from_when(self):
+        nonblank = self._nonblank
+        deleted = self._deleted
+        payload = "\n".join(
+            "%s-%s" % (line, i) if nonblank[i] else line
+            for i, line in enumerate(self._calendar_lines)
+            if i not in deleted
+        )
+
+        # An empty or all-comment calendar cannot produce any item:
+        # don't bother spawning when over it
+        if not any(
+            nonblank[i] and not line.lstrip().startswith("#")
+            for i, line in enumerate(self._calendar_lines)
+            if i not in deleted
+        ):
+            self._shown_items = []
+            self._line_numbers = []
+            return
 
         try:
             tmp = subprocess.run(
-                d, capture_output=True, text=True, check=True
+                self._when_argv,
+                input=payload,
+                capture_output=True,
+                text=True,
+                check=True,
+                close_fds=False,
             ).stdout
         except subprocess.CalledProcessError:
             raise InternalException
         if tmp.startswith("*"):
             raise InternalException
-        if self._view_mode.search_pattern is not None:
-            tmp = tmp.splitlines()
-            tmp = list(filter(lambda x: self._search(x), tmp))
-            tmp = "\n".join(tmp)
-        tmp = re.findall(r"^(.+)-(\d+)$", tmp, flags=re.MULTILINE)
-        self._shown_items = [x[0] for x in tmp]
-        self._line_numbers = [int(x[1]) for x in tmp]
+        # One pass over the output: the trailing -N was appended by us,
+        # so a plain rpartition per line beats the regex engine, and the
+        # search filter (when itself has no text filtering to push the
+        # work into) is applied while parsing instead of in a separate
+        # filter-join-split round trip
+        pattern = self._view_mode.search_pattern
+        items = []
+        line_numbers = []
+        for line in tmp.splitlines():
+            head, sep, tail = line.rpartition("-")
+            if not sep or not tail.isdigit():
+                continue
+            if pattern is not None and not self._search(line):
+                continue
+            items.append(head)
+            line_numbers.append(int(tail))
+        self._shown_items = items
+        self._line_numbers = line_numbers
 
     def _search(self, item):
+        # Only the four leading date fields need the regex; the event
+        # text is everything from there to the -N suffix we appended,
+        # which spares the old lazy full-line match its backtracking
         try:
-            m = re.match(r"^\s*(?:\S+\s+){4}(.+?)-\d+$", item)
-            return (
-                self._view_mode.search_pattern.search(m.group(1)) is not None
-            )
-        except AttributeError:
+            m = _SEARCH_PREFIX_RE.match(item)
+            text = item[m.end():item.rindex("-")]
+            return self._view_mode.search_pattern.search(text) is not None
+        except (AttributeError, ValueError):
             sys.exit(_("Internal error: could not process the output of when"))
 
     def get_items(self):
@@ -224,14 +605,28 @@ class Calendar:
     def conflicting_changes(self):
         return self._last_modified != os.path.getmtime(self._calendar)
 
-    # Update the true calendar
+    # Update the true calendar. The backup is taken by renaming the
+    # original (no data copied), and the new content goes to a sibling
+    # file renamed over the calendar afterwards, so a crash midway can
+    # not leave a half-written calendar behind.
 
     def write_calendar(self):
-        copyfile(self._calendar, self._backup_calendar)
+        mode = os.stat(self._calendar).st_mode & 0o7777
+        os.replace(self._calendar, self._backup_calendar)
         self._created_backup = True
-        with open(self._calendar, "w") as f:
-            for line in self._calendar_lines:
-                print(line, file=f)
+        tmp_calendar = self._calendar + ".SOMEDAY.TMP"
+        deleted = self._deleted
+        content = "\n".join(
+            line
+            for i, line in enumerate(self._calendar_lines)
+            if i not in deleted
+        )
+        with open(tmp_calendar, "w") as f:
+            if content:
+                f.write(content)
+                f.write("\n")
+        os.chmod(tmp_calendar, mode)
+        os.replace(tmp_calendar, self._calendar)
 
     # Show differences between the calendar and the generated backup
     def diff(self):
@@ -247,117 +642,138 @@ class Calendar:
     # Utilities on calendar entries
 
     def get_date_expression(self, index):
-        line = self.get_source_line(index)
-        m = re.match(r"^(.+?)\s*,", line)
-        return m.group(1).lstrip() if m else None
+        return _split_source_line(self.get_source_line(index))[0]
 
     def get_event(self, index):
-        line = self.get_source_line(index)
-        m = re.search(r",\s*(.+?)$", line)
-        return m.group(1).rstrip() if m else None
+        return _split_source_line(self.get_source_line(index))[1]
 
     def happens_only_once(self, index):
         date = self.get_date_expression(index)
         if date is None:  # just in case
             return False
-        if self._is_literal(date):
-            return True
-        tmp = self.parse_expression(date)
-        if tmp is None:
-            return False
-        if len(tmp) == 3:
-            if tmp[0] == "=":
-                if tmp[1] == "j" and tmp[2].isdigit():
-                    return True
-                elif tmp[2] == "j" and tmp[1].isdigit():
-                    return True
-                else:
-                    return False
-        return False
-
-    def _is_literal(self, text):
-        # Actually, bogus strings such as 'bla bla bla' will pass this test,
-        # but we can assume that any string which is passed to this method
-        # comes from a valid calendar containing only valid day and month names
-        if self.parse_expression(text) is not None:
-            return False
-        tmp = text.split()
-        if len(tmp) != 3:
+        return _happens_only_once(date)
+
+    # Check a single line before touching the calendar. A literal date
+    # is recognized in-process; anything else is run through when on its
+    # own, which costs O(1) instead of the O(calendar) refresh that
+    # would otherwise be done (and rolled back) just to learn the line
+    # is a typo.
+
+    def _validate_line(self, line):
+        stripped = line.strip()
+        if "," in stripped:
+            date_part = stripped.split(",", 1)[0]
+            if _parse_literal_date(date_part.strip()) is not None:
+                return True
+        try:
+            tmp = subprocess.run(
+                ["when", "--calendar=/dev/stdin", "--noheader", "--wrap=0"],
+                input=line + "\n",
+                capture_output=True,
+                text=True,
+                check=True,
+                close_fds=False,
+            ).stdout
+        except subprocess.CalledProcessError:
             return False
-        return "*" not in tmp
-
-    def parse_expression(self, text):
-        # Invalid expressions such as 'xx = #$$%' will get parsed by this
-        # method, but we can assume that any string which is passed to this
-        # method comes from a valid calendar containing only valid expressions
-        text = text.strip()
-        if not self._wellnested(text):
-            return None
-        if len(text) > 2 and text[0] == "(" and text[-1] == ")":
-            return self.parse_expression(text[1:-1])
-        # Parse operators in reversed order of precedence
-        for op in ["|", "&", "!", "=", "!=", "<", ">", "<=", ">=", "-", "%"]:
-            if op in text:
-                if op == "!":
-                    tmp = self.parse_expression(text[1:])
-                    return [op, tmp] if tmp else None
-                n = text.index(op)
-                tmp1 = self.parse_expression(text[0:n])
-                tmp2 = self.parse_expression(text[n + 1:])
-                if tmp1 and tmp2:
-                    return [op, tmp1, tmp2]
-        return text if " " not in text else None
-
-    def _wellnested(self, text):
-        # Some invalid expressions, such as ()j = 1, will pass this test, but
-        # we can assume that any string which is passed to this method comes
-        # from a valid calendar containing only valid expressions
-        n = 0
-        for ch in text:
-            if n < 0:
-                return False
-            elif ch == "(":
-                n += 1
-            elif ch == ")":
-                n -= 1
-        return n == 0
+        return not tmp.startswith("*")
 
     def update_source_line(self, index, what):
         what = str(what).strip()
         if not what:
             return self.delete_source_line(index)
+        if not self._validate_line(what):
+            return False
         line_number = self._line_numbers[index]
         old_value = self._calendar_lines[line_number]
+        old_nonblank = self._nonblank[line_number]
         self._calendar_lines[line_number] = what
+        self._nonblank[line_number] = True
         try:
             self._update_view()
             self._modified = True
             return True
         except InternalException:
             self._calendar_lines[line_number] = old_value
+            self._nonblank[line_number] = old_nonblank
             return False
 
+    # Deleting a line from the list proper would shift every later line
+    # down, an O(calendar) move per deletion. Instead, deleted lines are
+    # only marked, and skipped wherever the calendar is walked; the list
+    # is compacted once the marks accumulate.
+
     def delete_source_line(self, index):
         line_number = self._line_numbers[index]
-        old_value = self._calendar_lines[line_number]
-        del self._calendar_lines[line_number]
-        try:
-            self._update_view()
-            self._modified = True
-            return True
-        except InternalException:
-            # This should never happen, but just in case...
-            self._calendar_lines.insert(line_number, old_value)
-            return False
+        self._deleted.add(line_number)
+        # Removing a line cannot invalidate the remaining ones, so the
+        # view is spliced directly instead of being recomputed (through
+        # when, that would cost a fork per deletion). A recurring item
+        # shows up once per matching day: drop every occurrence. Fresh
+        # lists are bound on purpose, the List display cache tells the
+        # view changed by identity.
+        self._shown_items = [
+            item
+            for item, n in zip(self._shown_items, self._line_numbers)
+            if n != line_number
+        ]
+        self._line_numbers = [
+            n for n in self._line_numbers if n != line_number
+        ]
+        self._modified = True
+        if len(self._deleted) * 4 > len(self._calendar_lines):
+            self._compact()
+        return True
+
+    # Commenting a line out can only remove its own occurrences from the
+    # view (when skips comments by definition), so, as with deletion,
+    # the view is spliced directly and no filter re-run is needed.
+
+    def comment_source_line(self, index):
+        line_number = self._line_numbers[index]
+        self._calendar_lines[line_number] = (
+            "#" + self._calendar_lines[line_number]
+        )
+        self._shown_items = [
+            item
+            for item, n in zip(self._shown_items, self._line_numbers)
+            if n != line_number
+        ]
+        self._line_numbers = [
+            n for n in self._line_numbers if n != line_number
+        ]
+        self._modified = True
+
+    def _compact(self):
+        keep = [
+            i
+            for i in range(len(self._calendar_lines))
+            if i not in self._deleted
+        ]
+        self._calendar_lines = [self._calendar_lines[i] for i in keep]
+        self._nonblank = [self._nonblank[i] for i in keep]
+        self._deleted.clear()
+        # Remap the view's line numbers to the compacted positions right
+        # here, so the spliced view stays consistent without asking when
+        # for a refresh (which could fail and used to be the one
+        # unguarded path able to crash the session)
+        new_numbers = {old: new for new, old in enumerate(keep)}
+        self._line_numbers = [
+            new_numbers[n] for n in self._line_numbers
+        ]
 
     def add_source_line(self, what):
+        if not self._validate_line(what):
+            return False
         self._calendar_lines.append(what)
+        self._nonblank.append(bool(what) and not what.isspace())
         try:
             self._update_view()
             self._modified = True
             return True
         except InternalException:
             del self._calendar_lines[-1]
+            del self._nonblank[-1]
             return False
 
 
@@ -368,26 +784,47 @@ class List:
     def __init__(self, calendar):
         self._calendar = calendar
         self._items = []
+        self._n_items = 0
+        self._display_items = []
+        self._display_width = None
         self._first_item = 0
         self._selected_row = 0
+        # curses is already initialized by the time we are constructed,
+        # so the color attributes can be looked up once here instead of
+        # once per row drawn
+        self._color_normal = curses.color_pair(1)
+        self._color_selected = curses.color_pair(2)
 
     def show(self, screen, minrow, mincol, maxrow, maxcol):
-        self._items = calendar.get_items()
+        # self._calendar, not the module-level calendar: the instance is
+        # handed its Calendar at construction time
+        items = self._calendar.get_items()
         self._height = maxrow - minrow + 1
         width = maxcol - mincol + 1
+        # The items change only on edits and the width only on resizes,
+        # so cache the truncation to screen width instead of re-slicing
+        # every visible row on every redraw
+        if items is not self._items or width != self._display_width:
+            self._items = items
+            self._n_items = len(items)
+            self._display_width = width
+            self._display_items = [item[:width] for item in items]
         self._adjust_selected_item()
         if self._items:
-            for i, item in enumerate(self._items[self._first_item:]):
-                if i >= self._height:
-                    break
-                color = 2 if i == self._selected_row else 1
-                my_addstr(
-                    screen,
-                    minrow + i,
-                    mincol,
-                    item[:width],
-                    curses.color_pair(color),
+            # islice avoids copying the whole tail of the list just to
+            # show one screenful of it
+            visible = islice(
+                self._display_items,
+                self._first_item,
+                self._first_item + max(self._height, 0),
+            )
+            for i, item in enumerate(visible):
+                color = (
+                    self._color_selected
+                    if i == self._selected_row
+                    else self._color_normal
                 )
+                my_addstr(screen, minrow + i, mincol, item, color)
         else:
             my_addstr(
                 screen,
@@ -398,7 +835,7 @@ class List:
 
     def _adjust_selected_item(self):
         if self._items:
-            while self._first_item + self._selected_row >= len(self._items):
+            while self._first_item + self._selected_row >= self._n_items:
                 self.up()
         else:
             self.top()
@@ -407,22 +844,30 @@ class List:
         self._selected_row = 0
         self._first_item = 0
 
+    # The navigation methods report whether the selection actually moved,
+    # so the main loop can skip redrawing on keypresses at the boundaries
+
     def up(self):
         if not self._items:
-            return
+            return False
         elif self._selected_row > 0:
             self._selected_row -= 1
         elif self._first_item > 0:
             self._first_item -= 1
+        else:
+            return False
+        return True
 
     def down(self):
         if not self._items:
-            return
-        elif self._first_item + self._selected_row < len(self._items) - 1:
+            return False
+        elif self._first_item + self._selected_row < self._n_items - 1:
             if self._selected_row < self._height - 1:
                 self._selected_row += 1
             else:
                 self._first_item += 1
+            return True
+        return False
 
     def selected_item(self):
         self._adjust_selected_item()
@@ -440,18 +885,23 @@ class Menu:
     def __init__(self):
         self._menu = []
         self._key_bindings = {}
+        self._name_to_index = {}
         self._selected_index = None
         self._selected_menu_item = None
+        self._color_normal = curses.color_pair(1)
+        self._color_selected = curses.color_pair(2)
 
     # Delete the menu, but keep the last defined _selected_menu_item, to be
     # used by _adjust_selected_item(), below.
     def clear(self):
         self._menu = []
         self._key_bindings = {}
+        self._name_to_index = {}
         self._selected_index = None
 
     def add(self, what):
         self._menu.append(what)
+        self._name_to_index[what.name] = len(self._menu) - 1
         keys = what.key if isinstance(what.key, list) else [what.key]
         for key in keys:
             if isinstance(key, str):
@@ -487,17 +937,23 @@ class Menu:
             my_addstr(screen, minrow, 0, "<")
         i = first_item
         for item in self._menu[first_item:]:
+            name = item.name
+            name_len = len(name)
             if (
-                col + len(item.name) > width
+                col + name_len > width
                 or i < len(self._menu) - 1
-                and col + len(item.name) + 2 >= width
+                and col + name_len + 2 >= width
             ):
                 my_addstr(screen, minrow, col, ">")
                 break
             elif squeeze and i > first_item:
                 my_addstr(screen, minrow, col - 1, "|")
-            color = 2 if self._selected_index == i else 1
-            my_addstr(screen, minrow, col, item.name, curses.color_pair(color))
+            color = (
+                self._color_selected
+                if self._selected_index == i
+                else self._color_normal
+            )
+            my_addstr(screen, minrow, col, name, color)
             col += lengths[i]
             if col >= width:
                 break
@@ -509,12 +965,12 @@ class Menu:
     # same menu entry that was selected before (as identified by name), if it
     # still exists; otherwise, we reset the pointer to the first menu entry.
     def _adjust_selected_item(self):
-        self._selected_index = 0
         if self._selected_menu_item:
-            for i, item in enumerate(self._menu):
-                if item.name == self._selected_menu_item.name:
-                    self._selected_index = i
-                    return
+            self._selected_index = self._name_to_index.get(
+                self._selected_menu_item.name, 0
+            )
+        else:
+            self._selected_index = 0
         self._selected_menu_item = self._menu[self._selected_index]
 
     def get_selected_item(self, key):
@@ -526,20 +982,37 @@ class Menu:
             return None
 
     def left(self):
-        if self._selected_index > 0:
+        moved = self._selected_index > 0
+        if moved:
             self._selected_index -= 1
         self._selected_menu_item = self._menu[self._selected_index]
+        return moved
 
     def right(self):
-        if self._selected_index < len(self._menu) - 1:
+        moved = self._selected_index < len(self._menu) - 1
+        if moved:
             self._selected_index += 1
         self._selected_menu_item = self._menu[self._selected_index]
+        return moved
+
+
+_date_cache = (None, None)
 
 
 def get_date():
-    return subprocess.run(
-        ["when", "d"], capture_output=True, text=True
-    ).stdout.strip()
+    global _date_cache
+    today = date.today()
+    if _date_cache[0] != today:
+        _date_cache = (
+            today,
+            subprocess.run(
+                ["when", "d"],
+                capture_output=True,
+                text=True,
+                close_fds=False,
+            ).stdout.strip(),
+        )
+    return _date_cache[1]
 
 
 _YMD_dates = {}
@@ -556,6 +1029,7 @@ def get_YMD_date(julian_date):
             capture_output=True,
             text=True,
             check=True,
+            close_fds=False,
         ).stdout.strip()
         _YMD_dates[julian_date] = date
         return date
@@ -571,10 +1045,78 @@ def get_YMD_date(julian_date):
 
 _julian_dates = {}
 
+# The julian date of a given date string never changes, so the cache is
+# kept on disk between runs; only today's date (the None key) has to be
+# asked again every session
+
+_JULIAN_CACHE_PATH = os.path.join(
+    os.path.expanduser("~"), ".cache", "someday", "julian.json"
+)
+_JULIAN_CACHE_LIMIT = 10000
+_julian_cache_dirty = False
+
+
+def _load_julian_cache():
+    try:
+        with open(_JULIAN_CACHE_PATH) as f:
+            _julian_dates.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+
+
+def _save_julian_cache():
+    if not _julian_cache_dirty:
+        return
+    entries = {
+        now: j
+        for now, j in _julian_dates.items()
+        if now is not None and j is not None
+    }
+    if len(entries) > _JULIAN_CACHE_LIMIT:
+        # Dicts keep insertion order, so this drops the oldest entries
+        entries = dict(list(entries.items())[-_JULIAN_CACHE_LIMIT:])
+    try:
+        os.makedirs(os.path.dirname(_JULIAN_CACHE_PATH), exist_ok=True)
+        tmp_path = _JULIAN_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, _JULIAN_CACHE_PATH)
+    except OSError:
+        pass
+
+
+# when's julian day numbers are modified julian dates; this is their
+# offset from date.toordinal()
+_MJD_OFFSET = 678576
+
+
+def _date_to_julian(text):
+    # 'YYYY month DD', the shape found in listings and in user input;
+    # anything else returns None and is left to when itself
+    parts = text.split()
+    if len(parts) != 3 or not parts[0].isdigit() or not parts[2].isdigit():
+        return None
+    month = _parse_month(parts[1])
+    if month is None:
+        return None
+    try:
+        day = date(int(parts[0]), month, int(parts[2]))
+    except ValueError:
+        return None
+    return day.toordinal() - _MJD_OFFSET
+
 
 def get_julian_date(now=None):
+    global _julian_cache_dirty
     if now in _julian_dates:
         return _julian_dates[now]
+    if now is not None:
+        # The common date shapes never need a subprocess
+        j = _date_to_julian(now)
+        if j is not None:
+            _julian_dates[now] = j
+            _julian_cache_dirty = True
+            return j
     d = ["when", "j"]
     if now is not None:
         # The date is not surrounded by ', because no shell processing will be
@@ -582,11 +1124,17 @@ def get_julian_date(now=None):
         d.append("--now=%s" % now)
     try:
         tmp = subprocess.run(
-            d, capture_output=True, text=True, check=True
+            d,
+            capture_output=True,
+            text=True,
+            check=True,
+            close_fds=False,
         ).stdout.strip()
-        m = re.search(r"(\d{5})\.$", tmp)
+        m = _JULIAN_OUT_RE.search(tmp)
         j = int(m.group(1)) if m else None
         _julian_dates[now] = j
+        if now is not None and j is not None:
+            _julian_cache_dirty = True
         return j
     except (subprocess.CalledProcessError, AttributeError, UnicodeDecodeError):
         raise InternalException
@@ -638,6 +1186,10 @@ def my_input(value_to_edit=None):
         print()
 
 
+# The shape of a date entered as year month day
+_DATE_INPUT_RE = re.compile(r"\d+\s+\S+\s+\d+")
+
+
 # An utility function to enter a date either as YMD or days from now
 def my_date_input():
     say(
@@ -654,7 +1206,7 @@ def my_date_input():
             if is_numeric(_input):
                 _input = _input[1:] if _input.startswith("+") else _input
                 return get_julian_date() + int(_input)
-            elif re.match(r"\d+\s+\S+\s+\d+", _input):
+            elif _DATE_INPUT_RE.match(_input):
                 return get_julian_date(_input)
             else:
                 say(_("Wrong format!"))
@@ -716,18 +1268,8 @@ def delete(calendar, selected_item):
     calendar.delete_source_line(selected_item)
 
 
-def can_delete(calendar, selected_item):
-    return calendar.happens_only_once(selected_item)
-
-
 def comment(calendar, selected_item):
-    calendar.update_source_line(
-        selected_item, "#" + calendar.get_source_line(selected_item)
-    )
-
-
-def can_comment(calendar, selected_item):
-    return calendar.happens_only_once(selected_item)
+    calendar.comment_source_line(selected_item)
 
 
 @outside_curses
@@ -753,19 +1295,15 @@ def reschedule(calendar, selected_item):
             )
 
 
-def can_reschedule(calendar, selected_item):
-    return calendar.happens_only_once(selected_item)
-
-
 def is_numeric(text):
     text = text.strip()
     return text.isdigit() or text[0] in "+-" and text[1:].isdigit()
 
 
-JULIAN_THRESHOLD = r"\bj\s*>\s*(\d+)\b"
-YEARLY_THRESHOLD = r"\by\s*>\s*(\d+)\b"
-DATE_IN_LISTING = r"^\S+\s+(\S+\s+\S+\s+\S+)"
-YEAR_IN_LISTING = r"^\S+\s+(\d+)"
+JULIAN_THRESHOLD = re.compile(r"\bj\s*>\s*(\d+)\b")
+YEARLY_THRESHOLD = re.compile(r"\by\s*>\s*(\d+)\b")
+DATE_IN_LISTING = re.compile(r"^\S+\s+(\S+\s+\S+\s+\S+)")
+YEAR_IN_LISTING = re.compile(r"^\S+\s+(\d+)")
 
 
 def advance(calendar, selected_item):
@@ -777,11 +1315,11 @@ def advance(calendar, selected_item):
     line = calendar.get_source_line(selected_item)
     try:
         if variable_to_replace == "j":
-            m = re.match(DATE_IN_LISTING, item)
+            m = DATE_IN_LISTING.match(item)
             regex = JULIAN_THRESHOLD
             repl = get_julian_date(m.group(1))
         else:
-            m = re.match(YEAR_IN_LISTING, item)
+            m = YEAR_IN_LISTING.match(item)
             regex = YEARLY_THRESHOLD
             repl = m.group(1)
     except (re.error, AttributeError):
@@ -797,7 +1335,7 @@ def advance(calendar, selected_item):
         return
     calendar.update_source_line(
         selected_item,
-        re.sub(regex, "%s>%s" % (variable_to_replace, repl), line),
+        regex.sub("%s>%s" % (variable_to_replace, repl), line),
     )
 
 
@@ -806,32 +1344,37 @@ def can_advance(calendar, selected_item):
     variable_to_replace = _variable_to_replace(date)
     if variable_to_replace is None:
         return False
-    tmp = calendar.parse_expression(date)
+    tmp = parse_expression(date)
     if tmp is None:
         return False
     return _search_var(tmp, variable_to_replace)
 
 
 def _search_var(expr, var):
-    if (
-        len(expr) == 3
-        and expr[0] == ">"
-        and expr[1] == var
-        and expr[2].isdigit()
-    ):
-        return True
-    elif expr[0] == "&":
-        return _search_var(expr[1], var) or _search_var(expr[2], var)
-    else:
-        return False
+    # Walk the & tree with an explicit stack rather than recursing; deep
+    # conjunctions then cost no Python call frames
+    stack = [expr]
+    while stack:
+        expr = stack.pop()
+        if (
+            len(expr) == 3
+            and expr[0] == ">"
+            and expr[1] == var
+            and expr[2].isdigit()
+        ):
+            return True
+        elif expr[0] == "&":
+            stack.append(expr[1])
+            stack.append(expr[2])
+    return False
 
 
 def _has_julian_threshold(date):
-    return len(re.findall(JULIAN_THRESHOLD, date)) == 1
+    return len(JULIAN_THRESHOLD.findall(date)) == 1
 
 
 def _has_yearly_threshold(date):
-    return len(re.findall(YEARLY_THRESHOLD, date)) == 1
+    return len(YEARLY_THRESHOLD.findall(date)) == 1
 
 
 def _variable_to_replace(date):
@@ -871,33 +1414,59 @@ def new():
             )
 
 
-URL = r"https?:\/\/(?:www\.)?"
-URL += r"[-a-zA-Z0-9@:%._\+~#=]{1,256}"
-URL += r"\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)"
+URL = re.compile(
+    r"https?:\/\/(?:www\.)?"
+    r"[-a-zA-Z0-9@:%._\+~#=]{1,256}"
+    r"\.[a-zA-Z0-9()]{1,6}\b(?:[-a-zA-Z0-9()@:%_\+.~#?&//=]*)"
+)
 
 
 def open_url(calendar, selected_item):
-    urls = re.findall(URL, calendar.get_item(selected_item))
+    urls = URL.findall(calendar.get_item(selected_item))
     for url in urls:
         subprocess.run(["xdg-open", url])
         sleep(1)
 
 
 def can_open_url(calendar, selected_item):
-    return re.search(URL, calendar.get_item(selected_item)) is not None
+    return URL.search(calendar.get_item(selected_item)) is not None
+
+
+_expand_pad = None
+
+
+# Re-expanding an item recomputes the same wrapping, so memoize it (the
+# tuple keeps cached entries safely immutable). On a miss, one shared
+# TextWrapper is reused: textwrap.wrap would build a fresh one per call.
+_WRAPPER = textwrap.TextWrapper()
+
+
+@functools.lru_cache(maxsize=256)
+def _wrap(item, width):
+    _WRAPPER.width = width
+    return tuple(_WRAPPER.wrap(item))
 
 
 def expand(item, minrow, mincol, maxrow, maxcol):
+    global _expand_pad
     minrow -= 1
     width = maxcol - mincol + 1
-    lines = textwrap.wrap(item, width - 2)
+    lines = _wrap(item, width - 2)
     height = len(lines) + 2
-    pad = curses.newpad(height, width)
+    # Reuse one pad rather than allocating a fresh one per expansion
+    if _expand_pad is None:
+        _expand_pad = curses.newpad(height, width)
+    else:
+        if _expand_pad.getmaxyx() != (height, width):
+            _expand_pad.resize(height, width)
+        _expand_pad.erase()
+    pad = _expand_pad
     pad.border()
     for i, line in enumerate(lines):
         my_addstr(pad, i + 1, 1, line)
     minrow = min(minrow, maxrow - height + 1)
-    pad.refresh(0, 0, minrow, mincol, maxrow, maxcol)
+    pad.noutrefresh(0, 0, minrow, mincol, maxrow, maxcol)
+    curses.doupdate()
     pad.getch()
 
 
@@ -1025,6 +1594,10 @@ def choose_view_mode(calendar, item_list):
         break
 
 
+# 'name = arguments' lines in the view modes configuration file
+_VIEW_MODE_RE = re.compile(r"^(.+?)\s*=\s*(.+)\s*$", re.MULTILINE)
+
+
 def get_user_view_modes(conf_file):
     modes = []
     if os.path.exists(conf_file):
@@ -1033,9 +1606,7 @@ def get_user_view_modes(conf_file):
                 conf = map(str.strip, f.read().splitlines())
             conf = filter(lambda x: not x.startswith("#"), conf)
             conf = "\n".join(conf)
-            tmp = re.findall(
-                r"^(.+?)\s*=\s*(.+)\s*$", conf, flags=re.MULTILINE
-            )
+            tmp = _VIEW_MODE_RE.findall(conf)
             for mode in tmp:
                 args = get_args(shlex.split(mode[1]))
                 pattern = get_search_pattern(args)
@@ -1108,27 +1679,47 @@ def _show_monthly_calendar():
     print(_("Press any key to go back."))
 
 
+# The menu entries themselves never change, so each one is built a
+# single time; recreate_menu only decides which of them apply
+
+_MENU_EDIT = MenuItem(_("e"), _("Edit"), edit)
+_MENU_DELETE = MenuItem([_("d"), curses.KEY_DC], _("Done/delete"), delete)
+_MENU_RESCHEDULE = MenuItem(_("r"), _("Reschedule"), reschedule)
+_MENU_COMMENT = MenuItem(_("c"), _("Comment"), comment)
+_MENU_ADVANCE = MenuItem(_("a"), _("Advance"), advance)
+_MENU_BROWSE_URL = MenuItem(_("b"), _("Browse url"), open_url)
+_MENU_DUPLICATE = MenuItem(_("u"), _("dUplicate"), duplicate)
+_MENU_NEW = MenuItem(_("n"), _("New"), new)
+_MENU_VIEW = MenuItem(_("v"), _("View"), choose_view_mode)
+_MENU_MONTHLY = MenuItem(_("m"), _("Monthly cal."), show_calendar)
+
+
 def recreate_menu(menu, calendar, item_list):
     menu.clear()
     if calendar.get_items():
         selected_item = item_list.selected_item()
-        menu.add(MenuItem(_("e"), _("Edit"), edit))
-        if can_delete(calendar, selected_item):
-            menu.add(
-                MenuItem([_("d"), curses.KEY_DC], _("Done/delete"), delete)
-            )
-        if can_reschedule(calendar, selected_item):
-            menu.add(MenuItem(_("r"), _("Reschedule"), reschedule))
-        if can_comment(calendar, selected_item):
-            menu.add(MenuItem(_("c"), _("Comment"), comment))
+        # Done/delete, Reschedule and Comment are all offered exactly
+        # when the item cannot recur, so that is tested once
+        once = calendar.happens_only_once(selected_item)
+        menu.add(_MENU_EDIT)
+        if once:
+            menu.add(_MENU_DELETE)
+            menu.add(_MENU_RESCHEDULE)
+            menu.add(_MENU_COMMENT)
         if can_advance(calendar, selected_item):
-            menu.add(MenuItem(_("a"), _("Advance"), advance))
+            menu.add(_MENU_ADVANCE)
         if can_open_url(calendar, selected_item):
-            menu.add(MenuItem(_("b"), _("Browse url"), open_url))
-        menu.add(MenuItem(_("u"), _("dUplicate"), duplicate))
-    menu.add(MenuItem(_("n"), _("New"), new))
-    menu.add(MenuItem(_("v"), _("View"), choose_view_mode))
-    menu.add(MenuItem(_("m"), _("Monthly cal."), show_calendar))
+            menu.add(_MENU_BROWSE_URL)
+        menu.add(_MENU_DUPLICATE)
+    menu.add(_MENU_NEW)
+    menu.add(_MENU_VIEW)
+    menu.add(_MENU_MONTHLY)
+
+
+# The key codes that quit the browser, as plain integers so the main
+# loop compares the getch result without building any string
+
+_QUIT_KEYS = frozenset((ord("q"), ord("Q")))
 
 
 # This is the main function for browsing and updating the list of items
@@ -1162,55 +1753,52 @@ def main(stdscr, calendar):
         julian_date = get_julian_date()
     except InternalException:
         julian_date = _("Could not be determined.")
-
-    # Main loop for handling key inputs
-    while True:
-
-        stdscr.clear()
-
-        # Get the size of the window and define areas for the list of items
-        # and menu
-        width, height = os.get_terminal_size()
-        first_row = 2
-        last_row = height - 3
-        menu_row = height - 1
-
-        # Show the date at top of the screen
-
-        stdscr.addstr(
-            0, 0, _("%s - Julian date: %s") % (get_date(), julian_date)
-        )
-
-        # Draw the list of items
-        item_list.show(stdscr, first_row, 0, last_row, width - 1)
-
-        # Update and draw the menu of actions
-        recreate_menu(menu, calendar, item_list)
-        menu.show(stdscr, menu_row, 0, menu_row, width - 1)
-
-        stdscr.refresh()
-
-        # Flush the input stream
-        curses.flushinp()
-
-        # Get the key input
-        key = stdscr.getch()
-
-        # Handle the cursor keys to navigate the list of items and the menu
-        # of actions
-        if key < 0:  # Resizing of window generates a negative code
+    julian_date_day = date.today()
+
+    # Navigation handlers, bound once so each keypress resolves with a
+    # single dict lookup; they return whether the selection moved
+    nav_handlers = {
+        curses.KEY_UP: item_list.up,
+        curses.KEY_DOWN: item_list.down,
+        curses.KEY_LEFT: menu.left,
+        curses.KEY_RIGHT: menu.right,
+    }
+
+    # Redraw the screen only when some state actually changed: keypresses
+    # which have no effect (e.g. moving past the ends of the list) would
+    # otherwise force a full repaint for nothing
+
+    dirty = True
+
+    # True while the input fifo holds a key pushed back by the burst
+    # drain below, so the next redraw knows not to flush it away
+    pushed_back = False
+
+    # The menu only depends on the selected item and on the item list
+    # (which every calendar mutation rebinds), so rebuilding it can be
+    # skipped when neither changed (e.g. redraws after moving along the
+    # menu itself)
+    last_menu_selected = None
+    last_menu_items = None
+
+    # Process a single keypress; returns False when the user quits
+
+    def handle_key(key):
+        nonlocal dirty, width, height
+
+        # Handle the cursor keys to navigate the list of items and the
+        # menu of actions
+        nav_handler = nav_handlers.get(key)
+        # Resizing of window generates KEY_RESIZE or a negative code
+        if key < 0 or key == curses.KEY_RESIZE:
             width, height = os.get_terminal_size()
             curses.resizeterm(height, width)
-        elif key == curses.KEY_UP:
-            item_list.up()
-        elif key == curses.KEY_DOWN:
-            item_list.down()
-        elif key == curses.KEY_LEFT:
-            menu.left()
-        elif key == curses.KEY_RIGHT:
-            menu.right()
-        elif chr(key).lower() == "q":
-            break
+            dirty = True
+        elif nav_handler is not None:
+            # Keep any dirtiness accumulated earlier in a key burst
+            dirty = nav_handler() or dirty
+        elif key in _QUIT_KEYS:
+            return False
         else:
             if key == 10:
                 func = expand
@@ -1231,10 +1819,110 @@ def main(stdscr, calendar):
                     func(item, row, 0, last_row, width - 1)
                 else:
                     func(calendar, selected_item)
+            if func is not None:
+                # Actions may have left curses or written over the
+                # screen: the incremental update is not enough, so
+                # schedule a true full repaint
+                stdscr.clearok(True)
+                dirty = True
+        return True
+
+    # Main loop for handling key inputs
+    while True:
+
+        if dirty:
+            # erase() only clears the virtual screen, letting doupdate()
+            # emit the difference with what is already displayed instead
+            # of repainting every cell
+            stdscr.erase()
+
+            # Get the size of the window and define areas for the list of
+            # items and menu. The size is re-queried on every draw on
+            # purpose: KEY_RESIZE delivery is not guaranteed (e.g. in
+            # detached terminals), and one ioctl per redraw is nothing,
+            # so stale geometry heals itself at the next repaint
+            width, height = os.get_terminal_size()
+            first_row = 2
+            last_row = height - 3
+            menu_row = height - 1
+
+            # Show the date at top of the screen. A session can stay
+            # open across midnight, so refresh the cached julian date
+            # when the day changes
+
+            if date.today() != julian_date_day:
+                julian_date_day = date.today()
+                _julian_dates.pop(None, None)
+                try:
+                    julian_date = get_julian_date()
+                except InternalException:
+                    julian_date = _("Could not be determined.")
+
+            stdscr.addstr(
+                0, 0, _("%s - Julian date: %s") % (get_date(), julian_date)
+            )
+
+            # Draw the list of items
+            item_list.show(stdscr, first_row, 0, last_row, width - 1)
+
+            # Update and draw the menu of actions
+            items = calendar.get_items()
+            selected_item = item_list.selected_item() if items else None
+            if (
+                selected_item != last_menu_selected
+                or items is not last_menu_items
+            ):
+                recreate_menu(menu, calendar, item_list)
+                last_menu_selected = selected_item
+                last_menu_items = items
+            menu.show(stdscr, menu_row, 0, menu_row, width - 1)
+
+            stdscr.noutrefresh()
+            curses.doupdate()
+
+            # Flush the input stream -- unless the last burst pushed an
+            # action key back into it, which flushinp would discard
+            # along with the type-ahead
+            if not pushed_back:
+                curses.flushinp()
+
+            dirty = False
+
+        # Get the key input, then drain whatever navigation keys are
+        # already queued (e.g. keyboard auto-repeat while scrolling):
+        # the whole burst is applied to the state and paid for with a
+        # single redraw. Only navigation and resizes are safe to
+        # coalesce: action keys must wait for the redraw, which resyncs
+        # the item list with the calendar, so a queued one is pushed
+        # back and picked up again after the repaint.
+
+        key = stdscr.getch()
+        pushed_back = False
+        quit_requested = False
+        while True:
+            if not handle_key(key):
+                quit_requested = True
+                break
+            stdscr.nodelay(True)
+            key = stdscr.getch()
+            stdscr.nodelay(False)
+            if key == -1:
+                break
+            if (
+                key not in nav_handlers
+                and key >= 0
+                and key != curses.KEY_RESIZE
+            ):
+                curses.ungetch(key)
+                pushed_back = True
+                break
+        if quit_requested:
+            break
 
 
 if __name__ == "__main__":
     args = get_args()
+    _load_julian_cache()
     calendar = Calendar()
     try:
         calendar.set_view_mode(
@@ -1267,5 +1955,6 @@ if __name__ == "__main__":
         print(_("Exiting without changes."))
     finally:
         calendar.cleanup_proxy_calendar()
+        _save_julian_cache()
         if args.diff:
             calendar.diff()